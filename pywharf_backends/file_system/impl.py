@@ -1,9 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+import fcntl
+import functools
+import hashlib
+import json
+import os
 from os import makedirs
 from os.path import isdir, join, exists
-import pathlib
 import shutil
-from typing import Dict, List, Tuple
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
 import traceback
 
 from filelock import FileLock
@@ -24,8 +31,9 @@ from pywharf_core.backend import (
     BackendInstanceManager,
 )
 from pywharf_core.utils import (
-    write_toml,
+    atomic_write_toml,
     read_toml,
+    fast_copy_file,
     git_hash_sha,
     encrypt_local_file_ref,
     split_package_ext,
@@ -34,6 +42,7 @@ from pywharf_core.utils import (
 FILE_SYSTEM_TYPE = 'file_system'
 
 
+@dataclass
 class FileSystemConfig(PkgRepoConfig):
     # Override.
     type: str = FILE_SYSTEM_TYPE
@@ -43,6 +52,17 @@ class FileSystemConfig(PkgRepoConfig):
     write_secret: str = ''
 
 
+# secret_hash runs on every authenticated request. The deployment holds a
+# handful of long-lived tokens, so memoizing turns the per-request SHA-256
+# into a dict lookup.
+@functools.lru_cache(maxsize=1024)
+def _secret_hash(name: str, raw: str) -> str:
+    sha256_algo = hashlib.sha256()
+    sha256_algo.update(raw.encode())
+    return f'{name}-{sha256_algo.hexdigest()}'
+
+
+@dataclass
 class FileSystemSecret(PkgRepoSecret):
     # Override.
     type: str = FILE_SYSTEM_TYPE
@@ -51,12 +71,16 @@ class FileSystemSecret(PkgRepoSecret):
     def token(self) -> str:
         return self.raw
 
+    def secret_hash(self) -> str:
+        return _secret_hash(self.name, self.raw)
+
 
+@dataclass
 class FileSystemPkgRef(PkgRef):
     # Override.
     type: str = FILE_SYSTEM_TYPE
     # File system specific.
-    package_path: str
+    package_path: str = ''
 
     def auth_url(self, config: FileSystemConfig, secret: FileSystemSecret) -> str:
         encrypted_ref = encrypt_local_file_ref(self.package_path, f'{self.package}.{self.ext}')
@@ -70,18 +94,32 @@ class FileSystemPkgRef(PkgRef):
 class FileSystemPkgRepoPrivateFields:
     ready: bool
     err_msg: str
+    # Distribution directories known to exist, so _distrib_path only pays the
+    # mkdir syscall on the first sighting of a distribution.
+    known_distribs: Set[str]
+    known_distribs_lock: threading.Lock
+    # Whether the storage filesystem supports user xattrs (probed once).
+    use_xattr_meta: bool
+    # distrib path -> (dir mtime_ns, scanned refs). Uploads publish via rename,
+    # which bumps the directory mtime, so an unchanged mtime means an unchanged
+    # distribution and the previous scan can be reused.
+    scan_cache: Dict[str, Tuple[int, List[PkgRef]]]
 
 
 LOCK_TIMEOUT = 0.5
 META_SUFFIX = '.meta'
+# Extended attribute carrying the package meta, so package & meta share one
+# inode and a single fsync. Sidecar files remain the fallback for oversized
+# values and xattr-less filesystems.
+META_XATTR = 'user.pywharf.meta'
 
 
+@dataclass
 class FileSystemPkgRepo(PkgRepo):
     # Override.
     type: str = FILE_SYSTEM_TYPE
-    # File system specific.
-    config: FileSystemConfig
-    secret: FileSystemSecret
+    config: Optional[FileSystemConfig] = None
+    secret: Optional[FileSystemSecret] = None
 
     __slots__ = ('_private_fields',)
 
@@ -89,12 +127,18 @@ class FileSystemPkgRepo(PkgRepo):
     def _pvt(self) -> FileSystemPkgRepoPrivateFields:
         return object.__getattribute__(self, '_private_fields')
 
-    def __init__(self, **data):
-        super().__init__(**data)
+    def __post_init__(self):
         object.__setattr__(
             self,
             '_private_fields',
-            FileSystemPkgRepoPrivateFields(ready=True, err_msg=''),
+            FileSystemPkgRepoPrivateFields(
+                ready=True,
+                err_msg='',
+                known_distribs=set(),
+                known_distribs_lock=threading.Lock(),
+                use_xattr_meta=False,
+                scan_cache={},
+            ),
         )
 
         if not isdir(self.local_paths.cache):
@@ -103,6 +147,17 @@ class FileSystemPkgRepo(PkgRepo):
 
         makedirs(self._storage_path, exist_ok=True)
 
+        with os.scandir(self._storage_path) as entries:
+            self._pvt.known_distribs.update(entry.name for entry in entries if entry.is_dir())
+
+        if hasattr(os, 'setxattr'):
+            try:
+                os.setxattr(self._storage_path, META_XATTR, b'1')
+                os.removexattr(self._storage_path, META_XATTR)
+                self._pvt.use_xattr_meta = True
+            except OSError:
+                pass
+
     def record_error(self, error_message: str) -> None:
         self._pvt.ready = False
         self._pvt.err_msg = error_message
@@ -116,9 +171,6 @@ class FileSystemPkgRepo(PkgRepo):
     def auth_write(self) -> bool:
         return self.secret.token == self.config.write_secret
 
-    def _package_lock_path(self, filename: str) -> str:
-        return join(self.local_paths.lock, filename + '.lock')
-
     @property
     def _storage_path(self) -> str:
         return join(self.local_paths.cache, 'storage')
@@ -133,7 +185,11 @@ class FileSystemPkgRepo(PkgRepo):
 
     def _distrib_path(self, distrib: str) -> str:
         path = join(self._storage_path, distrib)
-        makedirs(path, exist_ok=True)
+        if distrib not in self._pvt.known_distribs:
+            with self._pvt.known_distribs_lock:
+                if distrib not in self._pvt.known_distribs:
+                    makedirs(path, exist_ok=True)
+                    self._pvt.known_distribs.add(distrib)
         return path
 
     def _package_path(self, distrib: str, filename: str) -> str:
@@ -144,20 +200,100 @@ class FileSystemPkgRepo(PkgRepo):
         distrib_path = self._distrib_path(distrib)
         return join(distrib_path, filename + META_SUFFIX)
 
-    def _upload_package(self, ctx: UploadPackageContext):
+    def _store_pkg_meta(self, path: str, meta: Dict[str, str]) -> bool:
+        if not self._pvt.use_xattr_meta:
+            return False
         try:
-            with FileLock(self._package_lock_path(ctx.filename), timeout=LOCK_TIMEOUT):
-                pkg_path = self._package_path(ctx.meta_distrib, ctx.filename)
-                pkg_meta_path = self._package_meta_path(ctx.meta_distrib, ctx.filename)
+            os.setxattr(path, META_XATTR, json.dumps(meta).encode())
+            return True
+        except OSError:
+            # Typically the value exceeds the xattr size limit
+            # (long description fields), keep the sidecar for this package.
+            return False
+
+    def _load_pkg_meta(
+        self,
+        package_path: str,
+        meta_path: Optional[str],
+    ) -> Optional[Dict[str, str]]:
+        if self._pvt.use_xattr_meta:
+            try:
+                return json.loads(os.getxattr(package_path, META_XATTR))
+            except OSError:
+                pass
+        if meta_path is not None and exists(meta_path):
+            return read_toml(meta_path)
+        return None
 
-                if exists(pkg_path) and exists(pkg_meta_path):
-                    ctx.failed = True
-                    ctx.message = 'Package already exists.'
-                    return
+    def _upload_package(self, ctx: UploadPackageContext):
+        lock_fd = -1
+        published = False
+        try:
+            distrib_path = self._distrib_path(ctx.meta_distrib)
+            pkg_path = join(distrib_path, ctx.filename)
+            pkg_meta_path = pkg_path + META_SUFFIX
+            tmp_path = pkg_path + '.tmp'
+
+            # Lock on the temporary file itself instead of a sidecar under
+            # local_paths.lock, halving the inode churn per upload. flock
+            # (not mere existence) carries the exclusion, so a temporary file
+            # left over by a crashed process doesn't block future uploads.
+            deadline = time.monotonic() + LOCK_TIMEOUT
+            while True:
+                # 0o666 less umask, matching what open(..., 'wb') would create;
+                # os.open's default of 0o777 would publish packages with exec
+                # bits since the tmp file's mode survives the rename.
+                fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY, 0o666)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError
+                    time.sleep(0.05)
+                    continue
 
-                # Save package & meta.
-                shutil.copyfile(ctx.path, pkg_path)
-                write_toml(pkg_meta_path, ctx.meta)
+                # The previous holder unlinks tmp_path on exit, so this lock
+                # may sit on an orphaned inode while a fresh file already
+                # exists at the path (and carries someone else's lock). Only
+                # a lock on the inode currently reachable via the path counts;
+                # on mismatch, reopen and lock again.
+                try:
+                    locked_live_inode = os.fstat(fd).st_ino == os.stat(tmp_path).st_ino
+                except OSError:
+                    locked_live_inode = False
+                if locked_live_inode:
+                    lock_fd = fd
+                    break
+
+                os.close(fd)
+                if time.monotonic() >= deadline:
+                    raise TimeoutError
+
+            if exists(pkg_path) and self._load_pkg_meta(pkg_path, pkg_meta_path) is not None:
+                ctx.failed = True
+                ctx.message = 'Package already exists.'
+                return
+
+            if self.config.verify_sha256_on_upload and not ctx.verify_sha256():
+                ctx.failed = True
+                ctx.message = 'SHA256 checksum not matched.'
+                return
+
+            # Force the lazy digest before persisting: the index build keys on
+            # it, so the stored meta must carry it whether or not the client
+            # sent one. (Not an assert, this must survive python -O.)
+            ctx.meta['sha256'] = ctx.meta_sha256
+
+            # Save package & meta. The rename is the atomic publish point:
+            # concurrent uploaders only see the package after its meta exists.
+            # Meta rides on the package file as an xattr where supported,
+            # halving the inodes and fsyncs per upload.
+            fast_copy_file(ctx.path, tmp_path)
+            if not self._store_pkg_meta(tmp_path, ctx.meta):
+                atomic_write_toml(pkg_meta_path, ctx.meta)
+            os.rename(tmp_path, pkg_path)
+            published = True
 
             # Update index.
             pkg_refs = self.collect_all_published_packages()
@@ -173,6 +309,15 @@ class FileSystemPkgRepo(PkgRepo):
             ctx.failed = True
             ctx.message = '_upload_package:\n' + traceback.format_exc()
 
+        finally:
+            if lock_fd >= 0:
+                if not published:
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+                os.close(lock_fd)
+
     def upload_package(self, filename: str, meta: Dict[str, str], path: str) -> UploadPackageResult:
         ctx = UploadPackageContext(filename=filename, meta=meta, path=path)
 
@@ -193,47 +338,99 @@ class FileSystemPkgRepo(PkgRepo):
 
         return UploadPackageResult(status=status, message=ctx.message)
 
-    def collect_all_published_packages(self) -> List[PkgRef]:
+    def _collect_distrib_pkg_refs(self, distrib_path: str) -> List[PkgRef]:
+        # filename -> [package_path, meta_path].
+        filename_to_paths: Dict[str, List[Optional[str]]] = {}
+
+        # C-level slice compare with the suffix length hoisted out of the loop,
+        # instead of a str.endswith method call per entry.
+        meta_suffix_len = len(META_SUFFIX)
+
+        with os.scandir(distrib_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name[-meta_suffix_len:] == META_SUFFIX:
+                    pair = filename_to_paths.setdefault(name[:-meta_suffix_len], [None, None])
+                    pair[1] = entry.path
+                else:
+                    pair = filename_to_paths.setdefault(name, [None, None])
+                    pair[0] = entry.path
+
         pkg_refs = []
+        for filename in sorted(filename_to_paths):
+            package_path, meta_path = filename_to_paths[filename]
+            if package_path is None:
+                continue
 
-        storage_path = pathlib.Path(self._storage_path)
-        for distrib_path in storage_path.iterdir():
-            if not distrib_path.is_dir():
+            meta = self._load_pkg_meta(package_path, meta_path)
+            if meta is None:
                 continue
 
-            filename_to_package = {}
-            filename_to_meta = {}
+            distrib = meta.get('distrib')
+            sha256 = meta.get('sha256')
+            if not distrib or not sha256:
+                continue
 
-            for child in distrib_path.iterdir():
-                if child.name.endswith(META_SUFFIX):
-                    filename = child.name[:-len(META_SUFFIX)]
-                    filename_to_meta[filename] = str(child)
-                else:
-                    filename = child.name
-                    filename_to_package[filename] = str(child)
+            package, ext = split_package_ext(filename)
+            if not ext:
+                continue
 
-            for filename in sorted(set(filename_to_package) & set(filename_to_meta)):
-                meta = read_toml(filename_to_meta[filename])
+            pkg_refs.append(
+                FileSystemPkgRef(
+                    distrib=distrib,
+                    package=package,
+                    ext=ext,
+                    sha256=sha256,
+                    meta=meta,
+                    package_path=package_path,
+                )
+            )
 
-                distrib = meta.get('distrib')
-                sha256 = meta.get('sha256')
-                if not distrib or not sha256:
-                    continue
+        return pkg_refs
 
-                package, ext = split_package_ext(filename)
-                if not ext:
-                    continue
+    def _collect_distrib_pkg_refs_cached(self, distrib_path: str, mtime_ns: int) -> List[PkgRef]:
+        # Plain dict ops are atomic under the GIL; a lost race only costs a
+        # duplicate scan of one directory.
+        cached = self._pvt.scan_cache.get(distrib_path)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
 
-                pkg_refs.append(
-                    FileSystemPkgRef(
-                        distrib=distrib,
-                        package=package,
-                        ext=ext,
-                        sha256=sha256,
-                        meta=meta,
-                        package_path=filename_to_package[filename],
-                    )
-                )
+        pkg_refs = self._collect_distrib_pkg_refs(distrib_path)
+        self._pvt.scan_cache[distrib_path] = (mtime_ns, pkg_refs)
+        return pkg_refs
+
+    def collect_all_published_packages(self) -> List[PkgRef]:
+        # scandir avoids the per-entry stat of pathlib.iterdir by reusing the
+        # d_type reported by the kernel.
+        with os.scandir(self._storage_path) as entries:
+            distrib_dirs = sorted(
+                (entry.path, entry.stat().st_mtime_ns) for entry in entries if entry.is_dir()
+            )
+
+        if not distrib_dirs:
+            self._pvt.scan_cache.clear()
+            return []
+
+        distrib_paths = [path for path, _ in distrib_dirs]
+        mtimes = [mtime_ns for _, mtime_ns in distrib_dirs]
+
+        # The GIL is released during the scandir/read syscalls,
+        # so scanning distributions in parallel overlaps the I/O.
+        max_workers = min(len(distrib_paths), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pkg_refs = []
+            for distrib_pkg_refs in executor.map(
+                self._collect_distrib_pkg_refs_cached,
+                distrib_paths,
+                mtimes,
+            ):
+                pkg_refs.extend(distrib_pkg_refs)
+
+        # Drop cache entries of removed distributions.
+        alive = set(distrib_paths)
+        for path in list(self._pvt.scan_cache):
+            if path not in alive:
+                del self._pvt.scan_cache[path]
 
         return pkg_refs
 
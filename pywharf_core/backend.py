@@ -1,29 +1,33 @@
-from abc import abstractmethod
-from enum import Enum, auto
+from abc import ABC, abstractmethod
+from dataclasses import MISSING, dataclass, field, fields
+from enum import IntEnum, auto
 import functools
 import hashlib
 import importlib
 import os
 import pkgutil
 import traceback
-from typing import Callable, Dict, List, Tuple, Iterable, TypeVar, Type, Optional
-import inspect
-
-from pydantic import BaseModel
+from typing import Any, Callable, Dict, List, Tuple, Iterable, TypeVar, Type, Optional
 
 from pywharf_core.utils import (
+    TREE_HASH_MIN_BYTES,
     read_toml,
     write_toml,
     normalize_distribution_name,
     now_timestamp,
-    update_hash_algo_with_file,
+    sha256_file,
+    tree_hash_file,
 )
 
 
 ####################
 # Static I/O types #
 ####################
-class LocalPaths(BaseModel):
+# Plain dataclasses rather than BaseModel throughout this module: these types
+# are built on every request and every index load from data the server itself
+# produced, and pydantic's per-field validation dominated those paths.
+@dataclass
+class LocalPaths:
     index: str
     log: str
     lock: str
@@ -38,26 +42,37 @@ class LocalPaths(BaseModel):
         os.makedirs(self.cache, exist_ok=True)
 
 
-class UploadPackageStatus(Enum):
+# IntEnum: comparisons in the result handling paths go through the int
+# fast path, and the codes serialize as plain ints if they ever need to.
+class UploadPackageStatus(IntEnum):
     SUCCEEDED = auto()
     CONFLICT = auto()
     BAD_REQUEST = auto()
 
 
-class UploadPackageResult(BaseModel):
+@dataclass
+class UploadPackageResult:
     status: UploadPackageStatus
     message: str = ''
 
 
-class UploadPackageContext(BaseModel):
-    filename: str
-    path: str
-    meta: Dict[str, str] = {}
-    failed: bool = False
-    message: str = ''
+class UploadPackageContext:
+    # Instantiated on every upload, hence slots to skip the per-instance dict.
+    __slots__ = ('filename', 'path', 'meta', 'failed', 'message')
 
-    def __init__(self, **data):
-        super().__init__(**data)
+    def __init__(
+        self,
+        filename: str,
+        path: str,
+        meta: Optional[Dict[str, str]] = None,
+        failed: bool = False,
+        message: str = '',
+    ) -> None:
+        self.filename = filename
+        self.path = path
+        self.meta = meta if meta is not None else {}
+        self.failed = failed
+        self.message = message
 
         # Fill distribution name.
         if not self.meta.get('distrib'):
@@ -67,14 +82,20 @@ class UploadPackageContext(BaseModel):
             else:
                 self.failed = True
                 self.message = 'Cannot generate the distribution name.'
-        assert self.meta_distrib
+                return
 
         # SHA256 checksum, also suggested by PEP-503.
-        if not self.meta.get('sha256'):
-            sha256_algo = hashlib.sha256()
-            update_hash_algo_with_file(self.path, sha256_algo)
-            self.meta['sha256'] = sha256_algo.hexdigest()
-        assert self.meta_sha256
+        # Trust the digest sent by the client (twine sends sha256_digest) to avoid
+        # a redundant full pass over the file.
+        if not self.meta.get('sha256') and self.meta.get('sha256_digest'):
+            self.meta['sha256'] = self.meta['sha256_digest']
+
+        # Supplementary tree hash for large payloads. The PEP-503 url fragment must
+        # stay a plain (single-threaded) SHA-256 of the file, while the chunked
+        # Merkle digest can be computed and re-verified with all cores.
+        if not self.meta.get('sha256_tree') \
+                and os.path.getsize(self.path) >= TREE_HASH_MIN_BYTES:
+            self.meta['sha256_tree'] = tree_hash_file(self.path)
 
     @property
     def meta_distrib(self) -> str:
@@ -82,25 +103,41 @@ class UploadPackageContext(BaseModel):
 
     @property
     def meta_sha256(self) -> str:
-        return self.meta['sha256']
-
-
-class UploadIndexStatus(Enum):
+        # Computed lazily since hashing requires a full read of the package.
+        sha256 = self.meta.get('sha256')
+        if not sha256:
+            sha256 = sha256_file(self.path)
+            self.meta['sha256'] = sha256
+        return sha256
+
+    def verify_sha256(self) -> bool:
+        # Only meaningful against a digest the client sent. Without one,
+        # meta_sha256 would lazily hash the same file into both sides of the
+        # comparison, so there is nothing to verify and the check is skipped.
+        claimed = self.meta.get('sha256')
+        if not claimed:
+            return True
+        return sha256_file(self.path) == claimed
+
+
+class UploadIndexStatus(IntEnum):
     SUCCEEDED = auto()
     FAILED = auto()
 
 
-class UploadIndexResult(BaseModel):
+@dataclass
+class UploadIndexResult:
     status: UploadIndexStatus
     message: str = ''
 
 
-class DownloadIndexStatus(Enum):
+class DownloadIndexStatus(IntEnum):
     SUCCEEDED = auto()
     FAILED = auto()
 
 
-class DownloadIndexResult(BaseModel):
+@dataclass
+class DownloadIndexResult:
     status: DownloadIndexStatus
     message: str = ''
 
@@ -108,42 +145,68 @@ class DownloadIndexResult(BaseModel):
 ####################################
 # Interfaces of package repository #
 ####################################
-class PkgRepoConfig(BaseModel):
-    type: str
-    name: str
+# All fields carry defaults so that backend subclasses can both override
+# them and append their own defaulted fields.
+@dataclass
+class PkgRepoConfig:
+    type: str = ''
+    name: str = ''
     max_file_bytes: int = 1024**3
     sync_index_interval: int = 60
+    verify_sha256_on_upload: bool = False
 
+    def dict(self) -> Dict[str, Any]:
+        # All fields are scalars; a shallow per-field read skips the recursive
+        # deep-copy walk of dataclasses.asdict.
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
 
-class PkgRepoSecret(BaseModel):
-    type: str
-    name: str
-    raw: str
+
+@dataclass
+class PkgRepoSecret:
+    type: str = ''
+    name: str = ''
+    raw: str = ''
 
     def secret_hash(self) -> str:
         sha256_algo = hashlib.sha256()
         sha256_algo.update(self.raw.encode())
         return f'{self.name}-{sha256_algo.hexdigest()}'
 
+    def dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
 
-class PkgRef(BaseModel):
-    type: str
-    distrib: str
-    package: str
-    ext: str
-    sha256: str
-    meta: Dict[str, str]
+
+# ABC so that a backend missing a method fails at instantiation, matching the
+# enforcement pydantic's metaclass used to provide. Unlike a pydantic schema
+# this costs nothing per subclass at import time.
+@dataclass
+class PkgRef(ABC):
+    type: str = ''
+    distrib: str = ''
+    package: str = ''
+    ext: str = ''
+    sha256: str = ''
+    meta: Dict[str, str] = field(default_factory=dict)
+
+    def dict(self) -> Dict[str, Any]:
+        # Dumped for every package of every index write; a shallow per-field
+        # read replaces asdict's recursive deep-copy walk. meta is copied so
+        # the dump cannot alias live state.
+        struct = {name: getattr(self, name) for name in self.__dataclass_fields__}
+        struct['meta'] = dict(struct['meta'])
+        return struct
 
     @abstractmethod
     def auth_url(self, config: PkgRepoConfig, secret: PkgRepoSecret) -> str:
         pass
 
 
-class PkgRepo(BaseModel):
-    type: str
-    config: PkgRepoConfig
-    secret: PkgRepoSecret
-    local_paths: LocalPaths
+@dataclass
+class PkgRepo(ABC):
+    type: str = ''
+    config: Optional[PkgRepoConfig] = None
+    secret: Optional[PkgRepoSecret] = None
+    local_paths: Optional[LocalPaths] = None
 
     @abstractmethod
     def record_error(self, error_message: str) -> None:
@@ -182,6 +245,27 @@ class PkgRepo(BaseModel):
         pass
 
 
+# type -> registration, populated by BackendRegistration.__init_subclass__
+# when a backend module gets imported. Registration is driven by class
+# creation, so discovery never walks module symbols or runs type tests
+# per symbol, and inspect stays out of the import graph.
+_TYPE_TO_REGISTRATION: Dict[str, Type['BackendRegistration']] = {}
+
+_BACKEND_NAMESPACE = 'pywharf_backends'
+
+# Backends distributed outside the pywharf_backends namespace can advertise
+# themselves under this entry-point group; loading the entry point imports the
+# module, which registers through __init_subclass__ like any bundled backend.
+_BACKEND_ENTRY_POINT_GROUP = 'pywharf.backends'
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    # Python 3.7, no stdlib importlib.metadata. Entry-point discovery is then
+    # skipped; the namespace scan still covers the bundled backends.
+    importlib_metadata = None
+
+
 class BackendRegistration:
     type: str = ''
     pkg_repo_config_cls: Type[PkgRepoConfig] = PkgRepoConfig
@@ -190,65 +274,98 @@ class BackendRegistration:
     pkg_ref_cls: Type[PkgRef] = PkgRef
     cli_name_to_func: Dict[str, Callable[[], int]] = {}
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
 
-######################
-# Backend reflection #
-######################
-class BackendInstanceManager:
+        if not cls.type:
+            # Intermediate subclass, not a concrete backend.
+            return
 
-    def __init__(self) -> None:
-        self._type_to_registration: Dict[str, Type[BackendRegistration]] = {}
+        # Type validation.
+        assert issubclass(cls.pkg_repo_config_cls, PkgRepoConfig) \
+            and cls.pkg_repo_config_cls is not PkgRepoConfig
+
+        assert issubclass(cls.pkg_repo_secret_cls, PkgRepoSecret) \
+            and cls.pkg_repo_secret_cls is not PkgRepoSecret
 
-        # Namespace package root.
-        root_module = importlib.import_module('.', 'pywharf_backends')
-        # Find all submodules.
-        for module_info in pkgutil.iter_modules(
-            root_module.__path__,  # type: ignore
-            root_module.__name__ + '.',
-        ):
-            # Load module.
-            module = importlib.import_module(module_info.name)
+        assert issubclass(cls.pkg_repo_cls, PkgRepo) \
+            and cls.pkg_repo_cls is not PkgRepo
 
-            # Find the registration class.
-            registration = None
-            for obj in module.__dict__.values():
-                if inspect.isclass(obj) \
-                        and issubclass(obj, BackendRegistration) and obj is not BackendRegistration:
-                    registration = obj
+        assert issubclass(cls.pkg_ref_cls, PkgRef) \
+            and cls.pkg_ref_cls is not PkgRef
 
-            if registration is None:
-                continue
+        _TYPE_TO_REGISTRATION[cls.type] = cls
 
-            # Type validation.
-            assert issubclass(registration, BackendRegistration)
 
-            assert registration.type
+######################
+# Backend reflection #
+######################
+# Run-once guard: the module set cannot change within a process, so the
+# pkgutil scan and the per-module imports are paid a single time no matter
+# how many BackendInstanceManager call sites trigger a full discovery.
+@functools.lru_cache(maxsize=1)
+def _import_all_backends() -> None:
+    # Namespace package root.
+    root_module = importlib.import_module('.', _BACKEND_NAMESPACE)
+    # Import all submodules. Importing is sufficient for registration
+    # since BackendRegistration subclasses register themselves.
+    # Serially, on the calling thread. Discovery can be triggered from
+    # module-level code (the worker-mode block in job.py does exactly that),
+    # in which case the caller still holds the import lock of its own
+    # partially-initialized module; a backend importing back from that module
+    # on a pool thread would deadlock, while a same-thread import re-enters
+    # the held lock and proceeds.
+    for module_info in pkgutil.iter_modules(
+        root_module.__path__,  # type: ignore
+        root_module.__name__ + '.',
+    ):
+        importlib.import_module(module_info.name)
+
+    if importlib_metadata is not None:
+        try:
+            entry_points = importlib_metadata.entry_points(group=_BACKEND_ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10, entry_points() takes no selector arguments.
+            entry_points = importlib_metadata.entry_points().get(_BACKEND_ENTRY_POINT_GROUP, ())
+        for entry_point in entry_points:
+            entry_point.load()
 
-            assert issubclass(registration.pkg_repo_config_cls, PkgRepoConfig) \
-                and registration.pkg_repo_config_cls is not PkgRepoConfig
 
-            assert issubclass(registration.pkg_repo_secret_cls, PkgRepoSecret) \
-                and registration.pkg_repo_secret_cls is not PkgRepoSecret
+def _import_backend(type_: str) -> None:
+    try:
+        # By convention the backend submodule is named after its type.
+        importlib.import_module(f'{_BACKEND_NAMESPACE}.{type_}')
+    except ImportError:
+        # Convention not followed, fall back to a full scan.
+        _import_all_backends()
 
-            assert issubclass(registration.pkg_repo_cls, PkgRepo) \
-                and registration.pkg_repo_cls is not PkgRepo
 
-            assert issubclass(registration.pkg_ref_cls, PkgRef) \
-                and registration.pkg_ref_cls is not PkgRef
+class BackendInstanceManager:
 
-            self._type_to_registration[registration.type] = registration
+    def __init__(self) -> None:
+        # Backend modules are imported lazily on the first request of their type,
+        # keeping heavyweight backends out of the import path of unrelated setups.
+        self._type_to_registration = _TYPE_TO_REGISTRATION
 
     @property
     def all_registrations(self) -> Iterable[Type[BackendRegistration]]:
+        _import_all_backends()
         return self._type_to_registration.values()
 
-    def _registration(self, **kwargs) -> Type[BackendRegistration]:
-        assert 'type' in kwargs
-        assert kwargs['type'] in self._type_to_registration
-        return self._type_to_registration[kwargs['type']]
+    def _registration(self, type_: str) -> Type[BackendRegistration]:
+        # Plain dict access: an unknown type raises KeyError naturally, and
+        # the hot load loops pay a single lookup instead of per-call asserts.
+        registration = self._type_to_registration.get(type_)
+        if registration is None:
+            _import_backend(type_)
+            registration = self._type_to_registration[type_]
+        return registration
 
     def create_pkg_repo_config(self, **kwargs) -> PkgRepoConfig:
-        return self._registration(**kwargs).pkg_repo_config_cls(**kwargs)
+        # Doubles as the reload path (load_pkg_repo_configs): dataclass
+        # construction runs no validation, so a dump/load round trip costs one
+        # plain ctor call and no separate no-validate variant is needed.
+        return self._registration(kwargs['type']).pkg_repo_config_cls(**kwargs)
 
     def create_pkg_repo_secret(self, **kwargs) -> PkgRepoSecret:
         name = kwargs.get('name')
@@ -275,14 +392,19 @@ class BackendInstanceManager:
                 raise ValueError(f'{env} is not set. name={name}, struct={struct}')
             struct['raw'] = raw_from_env
 
-        return self._registration(type=type_).pkg_repo_secret_cls(**struct)
+        return self._registration(type_).pkg_repo_secret_cls(**struct)
 
     def create_pkg_repo(self, **kwargs) -> PkgRepo:
-        return self._registration(**kwargs).pkg_repo_cls(**kwargs)
+        return self._registration(kwargs['type']).pkg_repo_cls(**kwargs)
 
     def create_pkg_ref(self, **kwargs) -> PkgRef:
-        return self._registration(**kwargs).pkg_ref_cls(**kwargs)
+        return self._registration(kwargs['type']).pkg_ref_cls(**kwargs)
 
+    # NOTE on the load_* methods: the TOML files they read are local state
+    # written by this same program (configs dumped by the admin workflow, the
+    # index dumped by dump_pkg_refs_and_mtime), i.e. trusted input. The types
+    # being plain dataclasses means rehydration already runs no per-field
+    # validation; don't reintroduce a validating layer on these paths.
     def load_pkg_repo_configs(self, path: str) -> Dict[str, PkgRepoConfig]:
         name_to_pkg_repo_config: Dict[str, PkgRepoConfig] = {}
 
@@ -343,11 +465,28 @@ class BackendInstanceManager:
 
         write_toml(path, dump)
 
+    def _iter_pkg_refs(self, structs: Iterable[Dict[str, Any]]) -> Iterable[PkgRef]:
+        # type -> ref class, memoized so thousands of rows of the same backend
+        # pay one registration lookup instead of one per row. With plain
+        # dataclass refs there is no validation layer left to batch-amortize;
+        # one ctor call per row is the whole cost.
+        type_to_ctor: Dict[str, Type[PkgRef]] = {}
+        for struct_pkg_ref in structs:
+            ctor = type_to_ctor.get(struct_pkg_ref['type'])
+            if ctor is None:
+                ctor = self._registration(struct_pkg_ref['type']).pkg_ref_cls
+                type_to_ctor[struct_pkg_ref['type']] = ctor
+            yield ctor(**struct_pkg_ref)
+
     def load_pkg_refs_and_mtime(self, path: str) -> Tuple[List[PkgRef], int]:
         struct = read_toml(path)
-        pkg_refs = [self.create_pkg_ref(**struct_pkg_ref) for struct_pkg_ref in struct['pkgs']]
-        mtime = struct['mtime']
-        return pkg_refs, mtime
+        return list(self._iter_pkg_refs(struct['pkgs'])), struct['mtime']
+
+    def load_pkg_repo_index(self, path: str) -> 'PkgRepoIndex':
+        struct = read_toml(path)
+        # Feed a generator to the index so only one PkgRef live-set exists,
+        # instead of materializing an intermediate list first.
+        return PkgRepoIndex(self._iter_pkg_refs(struct['pkgs']), struct['mtime'])
 
     @staticmethod
     def dump_pkg_refs_and_mtime(path: str, pkg_refs: Iterable[PkgRef]) -> None:
@@ -361,9 +500,15 @@ class BackendInstanceManager:
 ##########
 # Helper #
 ##########
-def basic_model_get_default(basic_model_cls: BaseModel, key: str):
-    assert key in basic_model_cls.__fields__
-    return basic_model_cls.__fields__[key].default
+# The (class, key) space is tiny and immutable, so cache the linear field
+# walk away for callers sitting in request paths.
+@functools.lru_cache(maxsize=256)
+def basic_model_get_default(basic_model_cls, key: str):
+    for fld in fields(basic_model_cls):
+        if fld.name == key:
+            assert fld.default is not MISSING
+            return fld.default
+    raise AssertionError(f'key={key} not in {basic_model_cls}')
 
 
 _METHOD = TypeVar('_METHOD')
@@ -373,9 +518,10 @@ def record_error_if_raises(method: _METHOD) -> _METHOD:
 
     @functools.wraps(method)
     def decorated(self, *args, **kwargs):
+        # Return straight out of the try block: a non-raising call pays no
+        # exception-handling cost, only the extra frame of this wrapper.
         try:
-            ret = method(self, *args, **kwargs)
-            return ret
+            return method(self, *args, **kwargs)
         except Exception:
             self.record_error(traceback.format_exc())
             raise
@@ -385,7 +531,7 @@ def record_error_if_raises(method: _METHOD) -> _METHOD:
 
 class PkgRepoIndex:
 
-    def __init__(self, pkg_refs: List[PkgRef], mtime: int) -> None:
+    def __init__(self, pkg_refs: Iterable[PkgRef], mtime: int) -> None:
         self._mtime = mtime
 
         self._distrib_to_pkg_refs: Dict[str, List[PkgRef]] = {}
@@ -406,10 +552,7 @@ class PkgRepoIndex:
         if pkg_ref.package in self._package_to_pkg_ref:
             raise KeyError(f'package={pkg_ref.package} duplicated.')
 
-        if pkg_ref.distrib not in self._distrib_to_pkg_refs:
-            self._distrib_to_pkg_refs[pkg_ref.distrib] = []
-
-        self._distrib_to_pkg_refs[pkg_ref.distrib].append(pkg_ref)
+        self._distrib_to_pkg_refs.setdefault(pkg_ref.distrib, []).append(pkg_ref)
         self._package_to_pkg_ref[pkg_ref.package] = pkg_ref
 
     def get_pkg_refs(self, query_distrib: str) -> Optional[List[PkgRef]]:
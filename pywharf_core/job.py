@@ -3,25 +3,35 @@ import functools
 
 
 class DynamicDramatiq:
+    # Touched on every task enqueue; slots keep the attribute reads cheap and
+    # drop the per-instance dict.
+    __slots__ = ('broker', 'func_to_actor_kwargs', 'func_to_actor', 'func_to_wrapped')
 
     def __init__(self) -> None:
         self.broker = None
         self.func_to_actor_kwargs = {}
         self.func_to_actor = {}
+        self.func_to_wrapped = {}
+
+    @staticmethod
+    def _broker_not_set(*args, **kwargs):
+        raise RuntimeError('Broker not set.')
 
     def actor(self, **actor_kwargs):
 
         def decorator(func):
             self.func_to_actor_kwargs[func] = actor_kwargs
 
+            # The wrapper calls straight through its _impl attribute, which
+            # set_broker patches to actor.send. A decorated function can be
+            # invoked many times per request, and this drops the per-call dict
+            # lookup and broker check from that path.
             @functools.wraps(func)
             def wrapped(*args, **kwargs):
-                actor = self.func_to_actor.get(func)
-                if actor is None:
-                    raise RuntimeError('Broker not set.')
-
-                return actor.send(*args, **kwargs)
+                return wrapped._impl(*args, **kwargs)
 
+            wrapped._impl = self._broker_not_set
+            self.func_to_wrapped[func] = wrapped
             return wrapped
 
         return decorator
@@ -34,7 +44,9 @@ class DynamicDramatiq:
 
         self.func_to_actor = {}
         for func, actor_kwargs in self.func_to_actor_kwargs.items():
-            self.func_to_actor[func] = dramatiq.actor(**actor_kwargs)(func)
+            actor = dramatiq.actor(**actor_kwargs)(func)
+            self.func_to_actor[func] = actor
+            self.func_to_wrapped[func]._impl = actor.send
 
 
 dynamic_dramatiq = DynamicDramatiq()
@@ -42,10 +54,11 @@ dynamic_dramatiq = DynamicDramatiq()
 # If set, enter worker mode.
 _REDIS_BROKER_PORT = os.getenv('DYNAMIC_DRAMATIQ_REDIS_BROKER_PORT')
 if _REDIS_BROKER_PORT:
-    # 1. Load actors.
+    # 1. Load actors. Backends are imported lazily in general, but the worker
+    # must import all of them eagerly so that their actors get registered.
     import pywharf_core.workflow  # noqa: F401
     from pywharf_core.backend import BackendInstanceManager
-    BackendInstanceManager()
+    list(BackendInstanceManager().all_registrations)
 
     # 2. Connect to broker.
     from dramatiq.brokers.redis import RedisBroker
@@ -1,29 +1,95 @@
 import base64
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
+import functools
 import json
 import hashlib
+import mmap
 import os
 import os.path
 import re
 import shutil
+import threading
 from typing import Callable, TextIO, Any
 import uuid
 import zlib
 
-from cryptography.fernet import Fernet
 from filelock import FileLock
 import toml
 
+try:
+    # Optional Rust-based parser/encoder (extras = ["rtoml"]), roughly an order
+    # of magnitude faster on the many-small-tables shape of a PkgRef index.
+    import rtoml
+except ImportError:
+    rtoml = None
+
+try:
+    # Python 3.11+, much faster than the third-party toml package.
+    import tomllib
+except ImportError:
+    tomllib = None
+
+
+def _loads_toml(text: str):
+    if rtoml is not None:
+        return rtoml.loads(text)
+    if tomllib is not None:
+        return tomllib.loads(text)
+    return toml.loads(text)
+
+
+def _dumps_toml(struct) -> str:
+    if rtoml is not None:
+        return rtoml.dumps(struct)
+    return toml.dumps(struct)
+
 
 def write_toml(path, struct):
     with open(path, 'w') as fout:
-        fout.write(toml.dumps(struct))
+        fout.write(_dumps_toml(struct))
+
+
+def atomic_write_toml(path, struct):
+    # Write to a uniquely named sibling and rename into place: readers never
+    # observe a partial write, and replacing an existing file is atomic (an
+    # unlink-then-link publish would leave a window with no file at all).
+    text = _dumps_toml(struct).encode()
+
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'wb') as fout:
+            fout.write(text)
+        os.rename(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+# Indexes beyond this size are mapped rather than read. MAP_POPULATE prefaults
+# the pages up front so the parser walks the buffer without page-fault stalls.
+_TOML_MMAP_MIN_BYTES = 1024**2
 
 
 def read_toml(path):
-    with open(path) as fin:
-        return toml.loads(fin.read())
+    # Hand the parsers one in-memory buffer: TOML parsing of many-table files
+    # is dominated by small reads and allocations when fed a file handle.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if size >= _TOML_MMAP_MIN_BYTES:
+            try:
+                flags = mmap.MAP_PRIVATE | getattr(mmap, 'MAP_POPULATE', 0)
+                with mmap.mmap(fd, size, flags=flags, prot=mmap.PROT_READ) as mm:
+                    return _loads_toml(mm[:].decode())
+            except (ValueError, OSError):
+                pass
+        with os.fdopen(os.dup(fd), 'rb') as fin:
+            return _loads_toml(fin.read().decode())
+    finally:
+        os.close(fd)
 
 
 def locked_read_file(lock_path, file_path, timeout=-1):
@@ -41,7 +107,7 @@ def locked_read_toml(lock_path, file_path, timeout=-1):
     status, text = locked_read_file(lock_path, file_path, timeout=timeout)
     struct = None
     if status and text is not None:
-        struct = toml.loads(text)
+        struct = _loads_toml(text)
     return status, struct
 
 
@@ -56,7 +122,7 @@ def locked_write_file(lock_path, file_path, text, timeout=-1):
 
 
 def locked_write_toml(lock_path, file_path, struct, timeout=-1):
-    return locked_write_file(lock_path, file_path, toml.dumps(struct), timeout=timeout)
+    return locked_write_file(lock_path, file_path, _dumps_toml(struct), timeout=timeout)
 
 
 def locked_copy_file(lock_path, src_path, dst_path, timeout=-1):
@@ -91,16 +157,134 @@ class LockedFileLikeObject(TextIO):
         return 0
 
 
+# https://www.python.org/dev/peps/pep-0503/#normalized-names
+_PEP503_NORMALIZE_RE = re.compile(r'[-_.]+')
+
+
+# Cached since the hot lookup paths (PkgRepoIndex.get_pkg_refs/get_single_pkg_ref)
+# normalize the same distribution names on every request.
+@functools.lru_cache(maxsize=8192)
 def normalize_distribution_name(name: str) -> str:
-    # https://www.python.org/dev/peps/pep-0503/#normalized-names
-    return re.sub(r'[-_.]+', '-', name).lower()
+    return _PEP503_NORMALIZE_RE.sub('-', name).lower()
+
+
+# hashlib releases the GIL for buffers larger than 2047 bytes, and large updates keep
+# the underlying SHA implementation in its fast path. 1MB windows over an mmap avoid
+# both the per-read syscalls and the intermediate copies of a read loop.
+_HASH_MMAP_WINDOW = 1024**2
+_HASH_READ_BLOCK = 256 * 1024
 
 
 def update_hash_algo_with_file(path: str, hash_alog: Any) -> None:
-    with open(path, 'rb') as fin:
-        # 64KB block.
-        for block in iter(lambda: fin.read(65536), b''):
-            hash_alog.update(block)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+
+        if hasattr(os, 'posix_fadvise'):
+            # Hint the kernel to prefetch ahead of the sequential pass.
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+
+        try:
+            mm = mmap.mmap(fd, size, prot=mmap.PROT_READ)
+        except (ValueError, OSError):
+            # Empty file, or mmap not supported (pipes & special files).
+            for block in iter(lambda: os.read(fd, _HASH_READ_BLOCK), b''):
+                hash_alog.update(block)
+            return
+
+        with mm:
+            with memoryview(mm) as view:
+                for begin in range(0, size, _HASH_MMAP_WINDOW):
+                    hash_alog.update(view[begin:begin + _HASH_MMAP_WINDOW])
+
+    finally:
+        os.close(fd)
+
+
+# Chunk layout of the parallel tree hash. Changing either constant changes
+# the resulting digests, so treat them as part of the on-disk format.
+TREE_HASH_MIN_BYTES = 64 * 1024**2
+_TREE_HASH_CHUNK = 16 * 1024**2
+
+
+def tree_hash_file(path: str) -> str:
+    """Merkle-style root: SHA-256 over the SHA-256 digests of 16MB chunks.
+
+    Unlike a plain SHA-256 pass, the per-chunk digests are independent, so they
+    run in a thread pool (hashlib releases the GIL on large buffers).
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+
+        root_algo = hashlib.sha256()
+
+        try:
+            mm = mmap.mmap(fd, size, prot=mmap.PROT_READ)
+        except (ValueError, OSError):
+            # Empty file or non-mappable input, hash the chunks sequentially.
+            for chunk in iter(lambda: os.read(fd, _TREE_HASH_CHUNK), b''):
+                root_algo.update(hashlib.sha256(chunk).digest())
+            return root_algo.hexdigest()
+
+        with mm:
+            with memoryview(mm) as view:
+
+                def chunk_digest(begin):
+                    return hashlib.sha256(view[begin:begin + _TREE_HASH_CHUNK]).digest()
+
+                begins = range(0, size, _TREE_HASH_CHUNK)
+                max_workers = min(len(begins), os.cpu_count() or 1)
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for digest in executor.map(chunk_digest, begins):
+                        root_algo.update(digest)
+
+        return root_algo.hexdigest()
+
+    finally:
+        os.close(fd)
+
+
+def fast_copy_file(src_path: str, dst_path: str) -> None:
+    if not hasattr(os, 'copy_file_range'):
+        shutil.copyfile(src_path, dst_path)
+        return
+
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        src_fd = src.fileno()
+        dst_fd = dst.fileno()
+        remaining = os.fstat(src_fd).st_size
+        try:
+            # In-kernel copy, no bytes cross userspace
+            # (and O(1) on filesystems supporting reflink).
+            while remaining > 0:
+                copied = os.copy_file_range(src_fd, dst_fd, remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        except OSError:
+            # Not supported by the filesystem (or a cross-device copy on an old
+            # kernel), redo with the plain read/write loop.
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+            shutil.copyfileobj(src, dst)
+
+
+def sha256_file(path: str) -> str:
+    file_digest = getattr(hashlib, 'file_digest', None)
+    if file_digest is not None:
+        # Python 3.11+: the read/update loop runs below the interpreter and
+        # feeds OpenSSL large chunks, hitting its SHA-NI path.
+        with open(path, 'rb') as fin:
+            return file_digest(fin, 'sha256').hexdigest()
+
+    sha256_algo = hashlib.sha256()
+    update_hash_algo_with_file(path, sha256_algo)
+    return sha256_algo.hexdigest()
 
 
 def git_hash_sha(path: str) -> str:
@@ -119,14 +303,28 @@ def get_secret_key():
     return secret_key
 
 
-_FERNET_SECRET_KEY = Fernet.generate_key()
+_FERNET = None
+_FERNET_LOCK = threading.Lock()
+
+
+def _fernet():
+    # cryptography is a heavyweight import; defer it (and the key generation)
+    # until the local-file ref encryption is actually used, so merely importing
+    # the core doesn't pull in the whole TLS stack.
+    global _FERNET
+    if _FERNET is None:
+        with _FERNET_LOCK:
+            if _FERNET is None:
+                from cryptography.fernet import Fernet
+                _FERNET = Fernet(Fernet.generate_key())
+    return _FERNET
 
 
 def encrypt_object_to_base64(obj):
     try:
         dumped = json.dumps(obj).encode()
         compressed_dumped = zlib.compress(dumped)
-        data = Fernet(_FERNET_SECRET_KEY).encrypt(compressed_dumped)
+        data = _fernet().encrypt(compressed_dumped)
         return base64.b64encode(data).decode()
     except Exception:
         return None
@@ -135,7 +333,7 @@ def encrypt_object_to_base64(obj):
 def decrypt_base64_to_object(text):
     try:
         base64_decoded = base64.b64decode(text.encode())
-        compressed_dumped = Fernet(_FERNET_SECRET_KEY).decrypt(base64_decoded)
+        compressed_dumped = _fernet().decrypt(base64_decoded)
         dumped = zlib.decompress(compressed_dumped)
         return json.loads(dumped.decode())
     except Exception:
@@ -5,7 +5,7 @@ from dataclasses import dataclass
 from datetime import datetime
 import logging
 import os
-from os.path import abspath, exists, getmtime, getsize, join
+from os.path import abspath, exists, join
 import subprocess
 import socket
 import tempfile
@@ -57,10 +57,11 @@ class SecretHashedStorage(Generic[SHST]):
         return self._hash_to_item[secret.secret_hash()]
 
 
-def get_mtime_size(path: str) -> Tuple[datetime, int]:
-    mtime = datetime.fromtimestamp(getmtime(path))
-    size = getsize(path)
-    return mtime, size
+def get_mtime_size(path: str) -> Tuple[int, int]:
+    # One stat call covers both fields; the pair is only ever compared for
+    # equality, so the raw nanosecond mtime beats a datetime round trip.
+    stat_result = os.stat(path)
+    return stat_result.st_mtime_ns, stat_result.st_size
 
 
 class BackgroundScheduler(_BackgroundScheduler):
@@ -90,7 +91,7 @@ class WorkflowStat:
 
     # Package index paths [(<lock-path>, <toml-path>)...]
     name_to_index_paths: Dict[str, Tuple[str, str]]
-    name_to_index_mtime_size: Dict[str, Tuple[datetime, int]]
+    name_to_index_mtime_size: Dict[str, Tuple[int, int]]
     name_to_pkg_repo_index: Dict[str, PkgRepoIndex]
 
     # Package repositories guarded by threading locks.
@@ -201,8 +202,8 @@ def build_workflow_stat(
 
         wstat.name_to_index_mtime_size[pkg_repo_config.name] = get_mtime_size(index_path)
 
-        pkg_refs, remote_mtime = wstat.backend_instance_manager.load_pkg_refs_and_mtime(index_path)
-        wstat.name_to_pkg_repo_index[pkg_repo_config.name] = PkgRepoIndex(pkg_refs, remote_mtime)
+        wstat.name_to_pkg_repo_index[pkg_repo_config.name] = \
+            wstat.backend_instance_manager.load_pkg_repo_index(index_path)
 
     return wstat
 
@@ -567,10 +568,8 @@ def keep_pkg_repo_index_up_to_date(wstat: WorkflowStat, name: str) -> Tuple[bool
 
             if cur_mtime_size != last_mtime_size:
                 # Index has been updated, reload.
-                pkg_refs, remote_mtime = \
-                    wstat.backend_instance_manager.load_pkg_refs_and_mtime(index_path)
                 wstat.name_to_pkg_repo_index[pkg_repo_config.name] = \
-                    PkgRepoIndex(pkg_refs, remote_mtime)
+                    wstat.backend_instance_manager.load_pkg_repo_index(index_path)
 
     except Exception:
         return False, traceback.format_exc()
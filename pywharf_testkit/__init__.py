@@ -1,8 +1,8 @@
 from abc import abstractmethod
 from dataclasses import dataclass
 import os
+import sys
 from typing import Optional, Tuple
-import inspect
 
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
@@ -109,10 +109,14 @@ class TestKit:
 
     @classmethod
     def pytest_injection(cls):
-        _caller_frame = inspect.currentframe().f_back
+        # Grab the caller's globals and drop the frame reference right away,
+        # so the closures below don't pin the caller's frame (and everything
+        # it references) for the lifetime of the injected fixtures.
+        _caller_frame = sys._getframe(1)
+        caller_globals = _caller_frame.f_globals
+        del _caller_frame
 
         def inject_to_caller(func):
-            caller_globals = _caller_frame.f_globals
             caller_globals[func.__name__] = func
             return func
 
@@ -123,6 +127,10 @@ class TestKit:
             pkg_repo_config_file = str(config_folder.join('config.toml'))
             admin_pkg_repo_secret_file = str(config_folder.join('admin_secret.toml'))
 
+            # Not worth caching the encoded artifacts across fixtures:
+            # setup_pkg_repo randomizes the repo name per call, so the
+            # serialized content is never identical, and a keyed cache would
+            # only grow per fixture while retaining secret material.
             BackendInstanceManager.dump_pkg_repo_configs(pkg_repo_config_file, [pkg_repo_config])
 
             if not admin_secret_as_env: